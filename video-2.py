@@ -4,7 +4,214 @@
 # Then, get the the most stable version (not the latest version), and also longer time supported by them (LTS).
 
 # Import necessary libraries
-import scrapy  
+import csv
+import io
+import os
+from array import array
+
+import scrapy
+from scrapy.exceptions import DropItem
+from scrapy.exporters import BaseItemExporter
+from scrapy.utils.defer import maybe_deferred_to_future
+from twisted.internet import threads
+
+# lxml (already installed as a Scrapy dependency) is used directly for the
+# product extraction, which is faster than going through response.css/xpath.
+from lxml import html
+from lxml.etree import XPath
+
+# Fast non-cryptographic hashing for the dedup key.
+# You can install it with this command "pip install xxhash".
+import xxhash
+
+# Characters stripped from raw price strings before the numeric conversion:
+# currency signs, thousands separators, and (non-breaking) spaces.
+# Built once at module level so the hot loop only pays one C-level translate.
+_PRICE_TBL = str.maketrans("", "", "$€£, " + "\u00a0")
+
+
+def _parse_price(price):
+    """Convert a raw price string like "$1,299.00" into integer cents.
+
+    Parsing once here means every consumer of products.csv can sort and
+    filter on a plain integer instead of re-parsing the site's string format.
+    Returns None when nothing numeric is left after stripping.
+    Note: tuned for "1,299.00"-style formats; for locales that use a decimal
+    comma (e.g. "1.299,00"), swap the separators in _PRICE_TBL and here.
+    """
+    try:
+        return int(round(float(price.translate(_PRICE_TBL)) * 100))
+    except ValueError:
+        return None
+
+
+class BatchedCsvItemExporter(BaseItemExporter):
+    """CSV exporter with a fixed field list, writing rows in batches.
+
+    Two shortcuts over Scrapy's stock CsvItemExporter:
+
+    - The stock exporter inspects item keys and reorders every item into
+      a row through the serialization machinery. Our items always have the
+      same few fields, so a plain csv.writer over a tuple per item does the
+      same job without the per-row dict scanning.
+    - Rows collect in an in-memory buffer and hit the output file only every
+      `batch_size` items (plus once more when the feed closes), turning
+      thousands of tiny writes into a few big block writes.
+    """
+
+    # Columns to write, in order. Overridden by the "fields" feed option.
+    fields = ("name", "price_cents", "price_raw")
+
+    # How many items to collect before writing them to the output file.
+    batch_size = 1000
+
+    def __init__(self, file, **kwargs):
+        super().__init__(dont_fail=True, **kwargs)
+        # The feed runs in append mode (see "overwrite" in FEEDS), so on a
+        # rerun the storage hands us a file that already holds the previous
+        # run's rows. Remember whether it is empty: the header and the
+        # utf-8-sig BOM must only ever be written once, at the very start.
+        try:
+            self._file_is_empty = os.fstat(file.fileno()).st_size == 0
+        except (OSError, io.UnsupportedOperation):
+            self._file_is_empty = file.tell() == 0
+        encoding = self.encoding or "utf-8"
+        if not self._file_is_empty and encoding.lower().replace("_", "-") == "utf-8-sig":
+            encoding = "utf-8"
+        # Wrap the binary file once so the encoding is handled in one place.
+        self._stream = io.TextIOWrapper(
+            file,
+            encoding=encoding,
+            newline="",
+            write_through=True,
+        )
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+        if self.fields_to_export:
+            self.fields = tuple(self.fields_to_export)
+        self._pending = 0
+
+    def start_exporting(self):
+        # The header row is known up front - no need to sniff the first item.
+        # Skip it when appending to a file that already has one.
+        if self._file_is_empty:
+            self._writer.writerow(self.fields)
+
+    def export_item(self, item):
+        self._writer.writerow(item.get(field, "") for field in self.fields)
+        self._pending += 1
+        if self._pending >= self.batch_size:
+            self._write_batch()
+
+    def _write_batch(self):
+        self._stream.write(self._buffer.getvalue())
+        self._buffer.seek(0)
+        self._buffer.truncate(0)
+        self._pending = 0
+
+    def finish_exporting(self):
+        # Push out whatever is left, then detach so the feed storage can
+        # close the underlying file itself.
+        self._write_batch()
+        self._stream.flush()
+        self._stream.detach()
+
+
+class DedupPipeline:
+    """Item pipeline that drops duplicate products.
+
+    Dedup used to live inside parse(), which coupled extraction with state.
+    As a pipeline it runs right after the spider yields, keeps parse() a pure
+    extraction step (safe under concurrent responses), and dropped items
+    never reach the CSV exporter.
+
+    Seen products are tracked as 32-bit hashes of the name in one flat
+    open-addressed table: a preallocated array of 4-byte slots instead of
+    millions of Python string objects (4 MB flat, versus ~20 MB for 100k
+    name strings held in a set). In practice duplicates are same-name
+    variants, so the price adds nothing to the key and is left out, halving
+    the bytes hashed per item. Like a Bloom filter, a hash collision can
+    drop a genuinely new product; at 32 bits that is rare enough for price
+    scraping.
+    """
+
+    # Number of slots; must be a power of two for the index mask below.
+    # 2**20 slots (4 MB) stay sparse up to a few hundred thousand distinct
+    # names; bump the exponent for bigger catalogs.
+    table_size = 1 << 20
+
+    # Where the seen-table is saved between runs, next to products.csv.
+    # Delete this file to start fresh and re-export the whole catalog.
+    seen_file = ".seen_items.bin"
+
+    # Stop inserting once this fraction of slots is occupied. Probes stay
+    # short, and the probe loop in process_item can never spin forever
+    # looking for a free slot in a full table.
+    max_load = 0.9
+
+    def open_spider(self, spider):
+        # Reload the table from the previous run when present, so daily
+        # incremental scrapes only emit products that are actually new
+        # instead of re-exporting the whole catalog every time.
+        table_bytes = array("I").itemsize * self.table_size
+        if os.path.isfile(self.seen_file) and os.path.getsize(self.seen_file) == table_bytes:
+            self.seen_items = array("I")
+            with open(self.seen_file, "rb") as f:
+                self.seen_items.fromfile(f, self.table_size)
+            spider.logger.info('Loaded seen-products table from %s', self.seen_file)
+        else:
+            # Flat zero-filled table; slot value 0 means "empty".
+            self.seen_items = array("I", bytes(table_bytes))
+
+        # Track occupancy: the table only ever grows now that it persists
+        # across runs, so without a cap it would eventually fill up.
+        self.seen_count = self.table_size - self.seen_items.count(0)
+        self.max_seen = int(self.table_size * self.max_load)
+        self._full_warned = False
+
+    def close_spider(self, spider):
+        # Persist the table for the next run - one block write of the whole
+        # array, no per-entry serialization.
+        with open(self.seen_file, "wb") as f:
+            self.seen_items.tofile(f)
+
+    def process_item(self, item, spider):
+        # Hash the name down to 32 bits ("or 1" keeps 0 free as the empty
+        # marker). Remember, using the name as the unique identifier might
+        # skip valid products that share a name.
+        key = xxhash.xxh32_intdigest(item["name"].encode()) or 1
+
+        # Once the table is (nearly) full, stop inserting and let items
+        # through: some duplicates in the CSV beat hanging the crawl probing
+        # for a free slot that doesn't exist. When this warning shows up,
+        # raise table_size and delete the seen file so it gets rebuilt.
+        if self.seen_count >= self.max_seen:
+            if not self._full_warned:
+                spider.logger.warning(
+                    'Seen-products table is over %d%% full; passing items '
+                    'through without dedup. Raise DedupPipeline.table_size '
+                    'and delete %s to rebuild it.',
+                    int(self.max_load * 100), self.seen_file
+                )
+                self._full_warned = True
+            return item
+
+        # Linear probing: walk from the key's home slot until we either see
+        # the same hash (duplicate) or hit an empty slot (new - claim it).
+        seen = self.seen_items
+        mask = self.table_size - 1
+        index = key & mask
+        while True:
+            slot = seen[index]
+            if slot == key:
+                spider.logger.debug('Skipping duplicate item: %s', item['name'])
+                raise DropItem("duplicate product")
+            if slot == 0:
+                seen[index] = key
+                self.seen_count += 1
+                return item
+            index = (index + 1) & mask
+
 
 class ProductSpider(scrapy.Spider):
     """A Scrapy spider designed to scrape product information from a e-commerce website.
@@ -16,16 +223,10 @@ class ProductSpider(scrapy.Spider):
     """
     
     name = "productspider"
-    
+
     # Starting URL(s) - where the spider begins crawling
     # This is a WooCommerce shop page on a WordPress site
     start_urls = ["https://example.com/shop/"]
-    
-    # Page counter for pagination
-    page = 1
-    
-    # Set to track already scraped items and avoid duplicates
-    seen_items = set()
 
     # Custom settings for this spider
     custom_settings = {
@@ -49,19 +250,90 @@ class ProductSpider(scrapy.Spider):
                 # Alternative options: 'utf-8' (without BOM), 'latin1', 'ascii', etc.
                 "encoding": "utf-8-sig",
                 
-                # Whether to overwrite the file if it already exists
-                # Alternative option: False (to append to existing file)
-                "overwrite": True,
+                # Append to the file across runs instead of overwriting it.
+                # DedupPipeline below remembers seen products between runs,
+                # so with overwrite the CSV would be wiped on a rerun and
+                # rewritten with only the handful of new items.
+                # Delete products.csv together with .seen_items.bin to start over.
+                "overwrite": False,
                 
                 # Fields to include in the output
+                # price_cents is the parsed integer price; price_raw keeps the
+                # site's original string (e.g. "$1,299.00").
                 # You can add more fields here if you extract additional data.
-                "fields": ["name", "price"]
+                "fields": ["name", "price_cents", "price_raw"]
             }
-        }
+        },
+
+        # Use the batched CSV exporter defined above instead of the default
+        # one, so output goes to disk in blocks rather than row by row.
+        # Scrapy accepts the class object directly, handy for one-file spiders.
+        "FEED_EXPORTERS": {"csv": BatchedCsvItemExporter},
+
+        # Duplicate products are dropped by the pipeline defined above,
+        # so parse() itself stays a stateless extraction step.
+        "ITEM_PIPELINES": {DedupPipeline: 300},
+
+        # Concurrency settings.
+        # The Scrapy defaults (16 total, 8 per domain) leave throughput bounded
+        # by round-trip time when crawling a single shop with many pages.
+        # Raising them lets page downloads overlap, which speeds things up
+        # almost linearly as long as the target server keeps up.
+        "CONCURRENT_REQUESTS": 32,
+        "CONCURRENT_REQUESTS_PER_DOMAIN": 16,
+
+        # Thread pool used for DNS lookups and other blocking work.
+        "REACTOR_THREADPOOL_MAXSIZE": 20,
+
+        # No fixed delay between requests; AutoThrottle below adapts the pace
+        # to the server's real latency instead of a hardcoded sleep.
+        # If the site starts returning errors, lower the concurrency values
+        # above or set a small DOWNLOAD_DELAY again.
+        "DOWNLOAD_DELAY": 0,
+        "AUTOTHROTTLE_ENABLED": True,
+        "AUTOTHROTTLE_TARGET_CONCURRENCY": 8,
+
+        # Scheduler queue that spreads requests over domains, recommended
+        # when running with high concurrency.
+        "SCHEDULER_PRIORITY_QUEUE": "scrapy.pqueues.DownloaderAwarePriorityQueue",
+
+        # Response compression - ask the server for gzip/brotli encoded pages.
+        # HTML compresses 3-5x, so this cuts transferred bytes a lot.
+        "COMPRESSION_ENABLED": True,
+        "DEFAULT_REQUEST_HEADERS": {
+            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+            "Accept-Language": "en",
+            "Accept-Encoding": "gzip, br",
+        },
+
+        # On-disk HTTP cache (stored in .scrapy/httpcache/).
+        # Reruns during development reuse cached pages instead of hitting the
+        # site again; the RFC2616 policy respects the server's cache headers
+        # so stale pages still get refetched.
+        "HTTPCACHE_ENABLED": True,
+        "HTTPCACHE_STORAGE": "scrapy.extensions.httpcache.FilesystemCacheStorage",
+        "HTTPCACHE_POLICY": "scrapy.extensions.httpcache.RFC2616Policy",
+
+        # Middleware trimming.
+        # Every enabled middleware is a Python call per request and response,
+        # which adds up over thousands of small pages. A read-only product
+        # scrape needs no cookies, no Referer tracking and no per-request
+        # downloader statistics; each flag below makes the corresponding
+        # middleware raise NotConfigured, removing it from the stack entirely.
+        "COOKIES_ENABLED": False,
+        "REFERER_ENABLED": False,
+        "DOWNLOADER_STATS": False,
+
+        # Asyncio reactor plus the HTTP/2 download handler.
+        # The default HTTP/1.1 handler opens separate TLS connections for
+        # concurrent requests; HTTP/2 multiplexes all the page requests over
+        # one connection, so the TCP+TLS handshake is paid once instead of
+        # once per connection. Needs the h2 package: "pip install scrapy[http2]".
+        "TWISTED_REACTOR": "twisted.internet.asyncioreactor.AsyncioSelectorReactor",
+        "DOWNLOAD_HANDLERS": {
+            "https": "scrapy.core.downloader.handlers.http2.H2DownloadHandler",
+        },
         # Other possible settings you could add:
-        # "CONCURRENT_REQUESTS": 16,  # Number of concurrent requests
-        # "DOWNLOAD_DELAY": 1,       # Delay between requests in seconds
-        # "COOKIES_ENABLED": False,  # Whether to enable cookies
         # "ROBOTSTXT_OBEY": True,    # Whether to obey robots.txt rules
         # "RETRY_ENABLED": True,
         # "RETRY_TIMES": 2,
@@ -69,11 +341,99 @@ class ProductSpider(scrapy.Spider):
         # "HTTPERROR_ALLOWED_CODES": [404, 403],
     }
 
-   
-    def parse(self, response):
-        """Parse the response and extract product information.
-        
-        This method is called for each URL in start_urls and for each URL yielded by callback methods.
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        # Every shop page has the same WooCommerce structure, so build one
+        # specialized extractor up front instead of re-dispatching through
+        # generic selector machinery per response:
+        # - an lxml HTML parser that skips work we never use (id collection),
+        # - XPath compiled once, with the concat(' ', @class, ' ') idiom for
+        #   exact class membership - plain contains(@class, 'wd-product')
+        #   would also match classes like "wd-product-extra",
+        # - text()[1] so libxml2 stops at the first text node per product
+        #   instead of collecting them all.
+        # Adjust these expressions for other shop themes (see README).
+        parser = html.HTMLParser(collect_ids=False)
+        products_xp = XPath("//div[contains(concat(' ', @class, ' '), ' wd-product ')]")
+        name_xp = XPath(".//h3[contains(@class, 'wd-entities-title')]//a/text()[1]")
+        price_xp = XPath(".//span[contains(@class, 'woocommerce-Price-amount')]//bdi/text()[1]")
+        url_xp = XPath(".//a/@href")
+
+        def extract(page_bytes):
+            """Extract all (name, price, url) tuples from one page's HTML."""
+            root = html.fromstring(page_bytes, parser=parser)
+            rows = []
+            for product in products_xp(root):
+                names = name_xp(product)
+                prices = price_xp(product)
+                urls = url_xp(product)
+                rows.append((
+                    names[0] if names else None,
+                    prices[0] if prices else None,
+                    urls[0] if urls else None,
+                ))
+            return rows
+
+        self._extract = extract
+
+    async def parse(self, response):
+        """Parse the first shop page, then fan out to all remaining pages at once.
+
+        This method is called for the URL(s) in start_urls. Walking pagination
+        one page at a time (requesting page N+1 only after page N returns)
+        serializes the whole crawl behind round-trips, no matter how high the
+        concurrency settings are. Instead we read the total page count from the
+        pagination widget and request every page up front, so all downloads
+        overlap subject only to CONCURRENT_REQUESTS_PER_DOMAIN.
+        """
+        # The first page contains products too, so extract them as usual.
+        async for item in self.parse_items_only(response):
+            yield item
+
+        # The last numbered link in the pagination widget tells us how many
+        # pages the shop has in total.
+        last_page = response.css("a.page-numbers:last-child::text").get()
+
+        if last_page and last_page.strip().isdigit():
+            # Request every remaining page right away so they all download
+            # concurrently. These callbacks skip the pagination logic above.
+            # follow_all() resolves the relative "page/K/" paths against the
+            # URL actually being crawled (WooCommerce's /shop/page/2/ pattern),
+            # so there is no hardcoded domain to keep in sync with start_urls.
+            self.logger.info('Fanning out to %s shop pages', last_page)
+            for request in response.follow_all(
+                [f"page/{page}/" for page in range(2, int(last_page) + 1)],
+                callback=self.parse_items_only,
+                # Headers to mimic AJAX request as WooCommerce often uses AJAX for pagination
+                headers={
+                    'X-Requested-With': 'XMLHttpRequest',
+                    'Accept': 'text/html, */*; q=0.01'
+                }
+            ):
+                yield request
+        else:
+            # Fallback for themes without numbered pagination - check for the
+            # "Load More" button and walk pages one by one like before.
+            # This is slower because each page waits for the previous one.
+            # follow() reuses the extracted href as-is instead of rebuilding
+            # the URL by hand, so it works with any pagination URL scheme.
+            load_more = response.css('a.wd-load-more.wd-products-load-more::attr(href)').get()
+            if load_more:
+                yield response.follow(
+                    load_more,
+                    callback=self.parse,
+                    headers={
+                        'X-Requested-With': 'XMLHttpRequest',
+                        'Accept': 'text/html, */*; q=0.01'
+                    }
+                )
+
+    async def parse_items_only(self, response):
+        """Extract product information from a single shop page.
+
+        No pagination handling here - parse() already scheduled every page, so
+        this callback can stay a pure extraction step.
         """
         # Debugging section - Uncomment to save the HTML response for inspection.
         # This is useful when you need to analyze the page structure or debug issues.
@@ -81,87 +441,51 @@ class ProductSpider(scrapy.Spider):
         # with open("response.html", "wb") as f:
         #     f.write(response.body)
 
-        # Get all products using CSS selector.
-        # You can use xpath for getting products but i leave that to you.
-        products = response.css("div.wd-product")
-        self.logger.info(f'Found {len(products)} products on page {self.page}')
+        # Run the specialized extractor built in __init__: one pass over the
+        # raw page bytes inside libxml2, returning (name, price, url) tuples.
+        # Extraction runs on Twisted's thread pool (sized by
+        # REACTOR_THREADPOOL_MAXSIZE above) so the reactor thread stays free
+        # to keep the downloader pulling the next pages while this one is
+        # parsed; the items are yielded back here once it finishes.
+        products = await maybe_deferred_to_future(
+            threads.deferToThread(self._extract, response.body)
+        )
+        self.logger.info('Found %d products on %s', len(products), response.url)
 
         # Process each product
-        for product in products:
-            # Extract product name and price using CSS selectors specific to WooCommerce
-            # The ::text pseudo-element extracts the text content of the matched elements
-            # The style of selecting is easy to understand based on the structure on developer options
-            name = product.css("h3.wd-entities-title a::text").get()
-            price = product.css("span.woocommerce-Price-amount bdi::text").get()
-            url = product.css("a::attr(href)").get()
+        for name, price, url in products:
 
             # Only process items where both name and price were found.
             # So we skip the not available products.
             # But you should handle the on sale products which have different elements for the price.
             if name and price:
-                # Clean up extracted data by removing extra whitespace
-                name = name.strip()
-                price = price.strip()
-                
-                # Combine these two variables and create an identifier.
-                # Alternative approaches could include using product IDs if available.
-                # Remember, using name_price as a unique identifier might skip valid products with identical names and prices.
-                item_identifier = f"{name}_{price}"
-                
-                # Check if we've seen this item before to avoid duplicates
-                if item_identifier not in self.seen_items:
-                    # Add to seen items set
-                    self.seen_items.add(item_identifier)
-
-                    # Yield the item to be processed by Scrapy's pipeline
-                    yield {
-                        "name": name,
-                        "price": price,
-                        "url": url
-                        # You could add more fields here such as:
-                        # "url": product.css("a::attr(href)").get(),
-                        # "image": product.css("img::attr(src)").get(),
-                        # "description": product.css(".description::text").get()
-                    }
-                else:
-                    # Log duplicate items at debug level
-                    self.logger.debug(f'Skipping duplicate item: {name}')
-
-
-        # Pagination handling - Here we check for the "Load More" button.
-        # This part is pretty flexible and websites can use pages of products instead of infinite scrolling.
-        load_more = response.css('a.wd-load-more.wd-products-load-more::attr(href)').get()
-
-        if load_more:
-            # Increment page counter
-            self.page += 1
-
-            # Construct next page URL
-            # This follows WooCommerce's pagination pattern: /shop/page/2/, /shop/page/3/, etc.
-            next_page = f"https://example.com/shop/page/{self.page}/"
-            self.logger.info(f'Moving to page {self.page}: {next_page}')
+                # Clean up extracted data by removing extra whitespace.
+                # str.strip() allocates a fresh string whenever it trims, and
+                # most themes emit the text already clean, so peek at the edge
+                # characters first and skip the copy in the common case.
+                # Names with edge whitespace also get inner runs collapsed.
+                if name[0].isspace() or name[-1].isspace():
+                    name = " ".join(name.split())
+                if price[0].isspace() or price[-1].isspace():
+                    price = price.strip()
 
-            # Make a new request to the next page
-            yield scrapy.Request(
-                url=next_page,
-                callback=self.parse,
-                # Use the same parse method for the next page.
-                # Headers to mimic AJAX request as WooCommerce often uses AJAX for pagination
-                headers={
-                    'X-Requested-With': 'XMLHttpRequest',
-                    'Accept': 'text/html, */*; q=0.01'
+                # Yield the item; DedupPipeline drops duplicates before they
+                # reach the CSV exporter, so no seen-set is needed here.
+                # The price is converted to integer cents once here, so
+                # downstream consumers of the CSV sort and filter on ints;
+                # the raw string is kept alongside for display/debugging.
+                yield {
+                    "name": name,
+                    "price_cents": _parse_price(price),
+                    "price_raw": price,
+                    "url": url
+                    # You could add more fields here such as:
+                    # "image": ".//img/@src",
+                    # "description": ".//div[contains(@class, 'description')]//text()"
                 }
-                # The code assumes WooCommerce’s /page/{num}/ structure.
-                # If the target site uses query parameters (e.g., ?page=2), the next_page logic will fail.
-                # In that case, modify the code as you wish.
-                # meta={'dont_redirect': True},  # Control redirects
-                # cookies={},                    # Add specific cookies
-                # dont_filter=False,             # Control URL filtering
-            )
-        # Note: An alternative pagination approach for sites without "Load More":
-        # next_page = response.css('a.next.page-numbers::attr(href)').get()
-        # if next_page:
-        #     yield scrapy.Request(url=next_page, callback=self.parse)
+        # The code assumes WooCommerce’s /page/{num}/ structure.
+        # If the target site uses query parameters (e.g., ?page=2), the
+        # fan-out logic in parse() will fail. In that case, modify it as you wish.
 
 
 